@@ -1,5 +1,5 @@
 from flask import Flask, request, jsonify
-import os, json, pickle, requests, psycopg2
+import os, json, pickle, hashlib, atexit, requests, psycopg2
 import pandas as pd
 import numpy as np
 import joblib
@@ -9,6 +9,10 @@ from dotenv import load_dotenv
 from langdetect import detect
 from deep_translator import GoogleTranslator
 from apscheduler.schedulers.background import BackgroundScheduler
+from village_analytics import VillageAnalytics
+import bulk_ingest
+from prediction_cache import PredictionCache
+from write_queue import IncrementQueue
 
 # ================= ENV & CONFIG =================
 load_dotenv()
@@ -132,6 +136,28 @@ disease_model = DiseasePredictor(len(symptom_columns), len(le_disease.classes_))
 disease_model.load_state_dict(torch.load(os.path.join(MODEL_DIR, "model.pth"), map_location="cpu"))
 disease_model.eval()
 
+def disease_model_version():
+    with open(os.path.join(MODEL_DIR, "model.pth"), "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()[:12]
+
+# Cached predictions are only valid for the weights they were computed with
+prediction_cache = PredictionCache(maxsize=4096, version=disease_model_version())
+
+def reload_disease_model_if_changed():
+    """Pick up retrained weights from model.pth and drop predictions made with the old ones."""
+    global disease_model
+    version = disease_model_version()
+    if version == prediction_cache.version:
+        return
+    # Build the new model off to the side and swap the reference, so requests
+    # already running a forward pass keep using the old weights untouched.
+    new_model = DiseasePredictor(len(symptom_columns), len(le_disease.classes_))
+    new_model.load_state_dict(torch.load(os.path.join(MODEL_DIR, "model.pth"), map_location="cpu"))
+    new_model.eval()
+    disease_model = new_model
+    prediction_cache.set_version(version)
+    print(f"[Disease] Reloaded model weights, version {version}")
+
 DISEASE_COLUMN_MAP = {
     "Leptospirosis": "leptospirosis", "Norovirus": "norovirus",
     "Legionnaires_Disease": "legionnaires_disease", "Dysentery_Bacillary": "dysentery_bacillary",
@@ -143,6 +169,83 @@ DISEASE_COLUMN_MAP = {
     "E_coli_Diarrhea": "e_coli_diarrhea"
 }
 
+# Columnar snapshot of AGGREGATE_TABLE used by the ranking endpoints
+village_analytics = VillageAnalytics(get_db_connection, AGGREGATE_TABLE, DISEASE_COLUMN_MAP.values())
+
+# Write-behind queue for AGGREGATE_TABLE increments, flushed by the scheduler below
+increment_queue = IncrementQueue(
+    os.path.join(BASE_DIR, "data", "increment_queue.sqlite3"),
+    get_db_connection, AGGREGATE_TABLE, DISEASE_COLUMN_MAP.values(),
+    commit=village_analytics.commit_and_mirror
+)
+
+SYMPTOM_INDEX = {col: i for i, col in enumerate(symptom_columns)}
+
+def symptom_bits(symptoms):
+    """Pack a symptom list into an int bitset over symptom_columns (unknown or non-string entries are ignored)."""
+    bits = 0
+    for s in symptoms:
+        if not isinstance(s, str):
+            continue
+        i = SYMPTOM_INDEX.get(s)
+        if i is not None:
+            bits |= 1 << i
+    return bits
+
+def _run_disease_model(bitsets, model):
+    """One forward pass over a list of bitsets -> list of (disease, probability)."""
+    X = np.zeros((len(bitsets), len(symptom_columns)), dtype=np.float32)
+    for row, bits in enumerate(bitsets):
+        for i in range(len(symptom_columns)):
+            if bits >> i & 1:
+                X[row, i] = 1.0
+    with torch.no_grad():
+        probs = torch.softmax(model(torch.from_numpy(X)), dim=1)
+        confidence, predicted = torch.max(probs, 1)
+    labels = le_disease.inverse_transform(predicted.numpy())
+    return [(str(label), float(p)) for label, p in zip(labels, confidence.numpy())]
+
+def predict_disease_details(symptom_lists):
+    """(disease, probability) for each symptom list; only cache misses reach the model."""
+    keys = [symptom_bits(symptoms) for symptoms in symptom_lists]
+    results = [prediction_cache.get(key) for key in keys]
+    missing = list({key for key, result in zip(keys, results) if result is None})
+    if missing:
+        # Version first, then model: the reload swaps the model before bumping the version
+        version = prediction_cache.version
+        computed = dict(zip(missing, _run_disease_model(missing, disease_model)))
+        for key, value in computed.items():
+            prediction_cache.put(key, value, version)
+        results = [computed[key] if result is None else result for key, result in zip(keys, results)]
+    return results
+
+def warm_prediction_cache(limit=None):
+    """Pre-compute predictions for the most frequent symptom combinations in TABLE_NAME."""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute(
+        f"SELECT symptoms FROM {TABLE_NAME} WHERE symptoms IS NOT NULL "
+        f"GROUP BY symptoms ORDER BY COUNT(*) DESC LIMIT %s;",
+        (limit or prediction_cache.maxsize,)
+    )
+    rows = cur.fetchall()
+    cur.close()
+    conn.close()
+    symptom_lists = []
+    for (symptoms,) in rows:
+        try:
+            symptoms = json.loads(symptoms) if isinstance(symptoms, str) else symptoms
+        except ValueError:
+            continue
+        if isinstance(symptoms, list):
+            symptom_lists.append(symptoms)
+    keys = list({symptom_bits(symptoms) for symptoms in symptom_lists})
+    version = prediction_cache.version
+    for key, value in zip(keys, _run_disease_model(keys, disease_model)):
+        prediction_cache.put(key, value, version)
+    print(f"[Disease] Prediction cache warmed with {len(keys)} symptom patterns")
+    return len(keys)
+
 def predict_disease_from_symptoms(symptoms_json):
     try:
         symptoms = json.loads(symptoms_json) if isinstance(symptoms_json, str) else symptoms_json
@@ -150,51 +253,58 @@ def predict_disease_from_symptoms(symptoms_json):
         symptoms = []
     if not isinstance(symptoms, list):
         symptoms = []
-    x_vec = [1 if col in symptoms else 0 for col in symptom_columns]
-    X = torch.tensor([x_vec], dtype=torch.float32)
-    with torch.no_grad():
-        outputs = disease_model(X)
-        _, predicted = torch.max(outputs, 1)
-        return le_disease.inverse_transform(predicted.numpy())[0]
+    return predict_disease_details([symptoms])[0][0]
+
+def predict_diseases_from_symptoms(symptom_lists):
+    """Batch variant of predict_disease_from_symptoms."""
+    return [disease for disease, _ in predict_disease_details(symptom_lists)]
 
 def increment_patient_disease(village, disease):
-    if disease not in DISEASE_COLUMN_MAP:
-        return
-    column = DISEASE_COLUMN_MAP[disease]
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute(f"SELECT 1 FROM {AGGREGATE_TABLE} WHERE village = %s;", (village,))
-    exists = cur.fetchone()
-    if exists:
-        cur.execute(f"UPDATE {AGGREGATE_TABLE} SET {column} = {column} + 1 WHERE village = %s;", (village,))
-    else:
-        all_columns = ', '.join(DISEASE_COLUMN_MAP.values())
-        all_values_list = ['1' if col == column else '0' for col in DISEASE_COLUMN_MAP.values()]
-        all_values_str = ', '.join(all_values_list)
-        cur.execute(f"INSERT INTO {AGGREGATE_TABLE} (village, {all_columns}) VALUES (%s, {all_values_str});", (village,))
-    conn.commit()
-    cur.close()
-    conn.close()
+    """
+    Queue a +1 for `disease` in `village`; increment_queue applies it to AGGREGATE_TABLE.
+    Returns whether an increment was queued.
+    """
+    # Reports without a village are not aggregated (same rule as the bulk ingestion path)
+    if disease not in DISEASE_COLUMN_MAP or bulk_ingest.is_blank_village(village):
+        return False
+    increment_queue.enqueue(village, DISEASE_COLUMN_MAP[disease])
+    return True
 
 def auto_update_predictions():
     conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute(f"SELECT id, symptoms, village FROM {TABLE_NAME} WHERE predicted_disease IS NULL OR predicted_disease = '';")
-    rows = cur.fetchall()
-    for row in rows:
-        patient_id, symptoms_json, village = row
-        if not symptoms_json:
-            continue
-        predicted = predict_disease_from_symptoms(symptoms_json)
-        cur.execute(f'UPDATE {TABLE_NAME} SET predicted_disease=%s WHERE id=%s', (predicted, patient_id))
-        increment_patient_disease(village, predicted)
-    conn.commit()
-    cur.close()
-    conn.close()
+    try:
+        cur = conn.cursor()
+        cur.execute(f"SELECT id, symptoms, village FROM {TABLE_NAME} WHERE predicted_disease IS NULL OR predicted_disease = '';")
+        rows = cur.fetchall()
+        for row in rows:
+            patient_id, symptoms_json, village = row
+            if not symptoms_json:
+                continue
+            # Commit each row before queueing its increment, so a failure on one
+            # row cannot roll back earlier predictions and replay their increments.
+            try:
+                predicted = predict_disease_from_symptoms(symptoms_json)
+                cur.execute(f'UPDATE {TABLE_NAME} SET predicted_disease=%s WHERE id=%s', (predicted, patient_id))
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                print(f"[Disease] Auto prediction failed for report {patient_id}: {e}")
+                continue
+            increment_patient_disease(village, predicted)
+        cur.close()
+    finally:
+        conn.close()
 
 scheduler = BackgroundScheduler()
 scheduler.add_job(func=auto_update_predictions, trigger="interval", seconds=30)
+# Periodic rebuild picks up rows written outside this process
+scheduler.add_job(func=village_analytics.refresh, trigger="interval", minutes=10)
+scheduler.add_job(func=reload_disease_model_if_changed, trigger="interval", minutes=5)
+scheduler.add_job(func=increment_queue.flush, trigger="interval", seconds=2)
+# One-off run right after start, so startup does not wait on the database
+scheduler.add_job(func=warm_prediction_cache)
 scheduler.start()
+atexit.register(increment_queue.drain)
 
 @app.route("/api/v1/predict-disease", methods=["POST"])
 def predict_disease():
@@ -206,9 +316,62 @@ def predict_disease():
     village = data["village"]
     if not isinstance(symptoms, list):
         return jsonify({"error": "symptoms must be a list"}), 400
-    predicted = predict_disease_from_symptoms(symptoms)
-    increment_patient_disease(village, predicted)
-    return jsonify({"predicted_disease": predicted, "message": f"✅ incremented {predicted} count for {village}"})
+    if bulk_ingest.is_blank_village(village):
+        return jsonify({"error": "village must be a non-empty string"}), 400
+    predicted, confidence = predict_disease_details([symptoms])[0]
+    if increment_patient_disease(village, predicted):
+        message = f"✅ queued {predicted} count increment for {village}"
+    else:
+        message = f"{predicted} is not tracked in {AGGREGATE_TABLE}; no count increment queued"
+    return jsonify({"predicted_disease": predicted, "confidence": round(confidence, 4),
+                    "message": message})
+
+@app.route("/api/v1/reports/bulk", methods=["POST"])
+def bulk_reports():
+    """
+    Ingest a batch of offline reports (NDJSON or JSON array, optionally gzip-compressed).
+    Each report needs a client-generated `client_id`; re-uploading the same id is a no-op.
+    Returns one result per report: created / duplicate / invalid.
+    """
+    if (request.content_length or 0) > bulk_ingest.MAX_PAYLOAD_BYTES:
+        return jsonify({"error": "payload too large"}), 413
+    try:
+        records = bulk_ingest.decode_batch(request.get_data(), request.headers.get("Content-Encoding"))
+    except bulk_ingest.BatchError as e:
+        return jsonify({"error": str(e)}), 400
+
+    df, errors = bulk_ingest.validate_batch(records)
+
+    conn = get_db_connection()
+    try:
+        bulk_ingest.ensure_idempotency_table(conn)
+        results, increments = bulk_ingest.ingest_batch(
+            conn, df, errors, predict_diseases_from_symptoms, DISEASE_COLUMN_MAP, AGGREGATE_TABLE
+        )
+        village_analytics.commit_and_mirror(conn, increments)
+    except Exception as e:
+        conn.rollback()
+        return jsonify({"error": f"batch rejected: {e}"}), 500
+    finally:
+        conn.close()
+
+    summary = {status: sum(r["status"] == status for r in results) for status in ("created", "duplicate", "invalid")}
+    return jsonify({"results": results, **summary})
+
+@app.route("/api/v1/village-analytics", methods=["GET"])
+def village_analytics_stats():
+    """Size of the in-memory village snapshot behind the ranking endpoints."""
+    return jsonify(village_analytics.stats())
+
+@app.route("/api/v1/write-queue", methods=["GET"])
+def write_queue_stats():
+    """Depth and flush lag of the write-behind increment queue."""
+    return jsonify(increment_queue.stats())
+
+@app.route("/api/v1/prediction-cache", methods=["GET"])
+def prediction_cache_stats():
+    """Hit rate and size of the symptom-pattern prediction cache."""
+    return jsonify(prediction_cache.stats())
 
 ##################################################
 ##################TOP VILLAGES####################
@@ -230,26 +393,7 @@ def top_villages():
     district = "West Siang"
     limit = request.args.get("limit", default=20, type=int)
 
-    conn = get_db_connection()
-    cur = conn.cursor()
-
-    sum_expr = " + ".join(DISEASE_COLUMN_MAP.values())
-
-    # Query filtered by state and district
-    query = f"""
-        SELECT village, ({sum_expr}) AS total_cases
-        FROM {AGGREGATE_TABLE}
-        WHERE state = %s AND district = %s
-        ORDER BY total_cases DESC
-        LIMIT %s;
-    """
-    cur.execute(query, (state, district, limit))
-    rows = cur.fetchall()
-
-    results = [{"village": row[0], "total_cases": row[1]} for row in rows]
-
-    cur.close()
-    conn.close()
+    results = village_analytics.top_by_total(state, district, limit)
 
     return jsonify({
         "state": state,
@@ -274,46 +418,61 @@ def top_villages_percentage():
     district = "West Siang"
     limit = request.args.get("limit", default=20, type=int)
 
-    conn = get_db_connection()
-    cur = conn.cursor()
+    results = village_analytics.top_by_percentage(state, district, limit)
 
-    sum_expr = " + ".join(DISEASE_COLUMN_MAP.values())
-
-    # Assuming AGGREGATE_TABLE has `population` column
-    query = f"""
-        SELECT village,
-               ({sum_expr}) AS total_cases,
-               population,
-               CASE 
-                   WHEN population > 0 THEN ROUND((({sum_expr})::numeric / population) * 100, 2)
-                   ELSE 0
-               END AS percentage_affected
-        FROM {AGGREGATE_TABLE}
-        WHERE state = %s AND district = %s
-        ORDER BY percentage_affected DESC
-        LIMIT %s;
+    return jsonify({
+        "state": state,
+        "district": district,
+        "top_villages_by_percentage": results,
+        "message": f"Top {len(results)} villages in {district}, {state} by percentage affected"
+    })
+
+################### By Disease #################################
+
+@app.route("/api/v1/top-villages-by-disease", methods=["GET"])
+def top_villages_by_disease():
     """
-    cur.execute(query, (state, district, limit))
-    rows = cur.fetchall()
+    Return top villages of Arunachal Pradesh (West Siang district) for a single disease.
+    Query Parameters:
+        disease (str) -> disease name, e.g. Cholera (required)
+        limit (int) -> number of top villages to return (default 20)
+    Example:
+        /api/v1/top-villages-by-disease?disease=Cholera&limit=5
+    """
+    state = "Arunachal Pradesh"
+    district = "West Siang"
+    disease = request.args.get("disease")
+    limit = request.args.get("limit", default=20, type=int)
 
-    results = [
-        {
-            "village": row[0],
-            "total_cases": int(row[1]),
-            "population": int(row[2]),
-            "percentage_affected": float(row[3])
-        }
-        for row in rows
-    ]
+    if disease not in DISEASE_COLUMN_MAP:
+        return jsonify({"error": f"unknown disease. expected one of: {list(DISEASE_COLUMN_MAP)}"}), 400
 
-    cur.close()
-    conn.close()
+    results = village_analytics.top_by_disease(DISEASE_COLUMN_MAP[disease], state, district, limit)
 
     return jsonify({
         "state": state,
         "district": district,
-        "top_villages_by_percentage": results,
-        "message": f"Top {len(results)} villages in {district}, {state} by percentage affected"
+        "disease": disease,
+        "top_villages": results,
+        "message": f"Top {len(results)} villages in {district}, {state} by {disease} cases"
+    })
+
+################### District rollup #################################
+
+@app.route("/api/v1/district-summary", methods=["GET"])
+def district_summary():
+    """
+    Return per-district case totals (overall and per disease) for Arunachal Pradesh.
+    Example:
+        /api/v1/district-summary
+    """
+    state = "Arunachal Pradesh"
+    results = village_analytics.district_rollup(state)
+
+    return jsonify({
+        "state": state,
+        "districts": results,
+        "total": len(results)
     })
 
 ################### High risk villages ###################
@@ -0,0 +1,299 @@
+import io
+import json
+import math
+import zlib
+import pandas as pd
+from psycopg2.extras import execute_values
+
+REPORTS_TABLE = "disease_reports"
+IDEMPOTENCY_TABLE = "report_idempotency"
+MAX_BATCH_SIZE = 5000
+# Upper bound on the decompressed payload, checked while inflating so a small
+# gzip bomb cannot expand past it.
+MAX_PAYLOAD_BYTES = 20 * 1024 * 1024
+
+# Same required fields as the Node addReport controller, plus the
+# client-generated id used for deduplication.
+REQUIRED_FIELDS = [
+    "client_id", "patient_name", "phone_no", "age_group", "symptoms",
+    "onset_date", "severity", "water_source", "reported_by"
+]
+OPTIONAL_FIELDS = [
+    "latitude", "longitude", "location_accuracy", "description",
+    "state", "district", "village"
+]
+# Allowed absolute range per numeric field; disease_reports stores them as
+# numeric(10,8), numeric(11,8) and numeric(10,2), so anything wider overflows COPY.
+NUMERIC_FIELDS = {"latitude": 90, "longitude": 180, "location_accuracy": 10 ** 8 - 0.01}
+STRING_FIELDS = [
+    "patient_name", "phone_no", "age_group", "onset_date", "severity", "water_source",
+    "reported_by", "description", "state", "district", "village"
+]
+
+# disease_reports columns written by COPY, in order
+COPY_COLUMNS = [
+    "id", "patient_name", "age_group", "latitude", "longitude", "location_accuracy",
+    "symptoms", "onset_date", "severity", "description", "water_source",
+    "reported_by", "predicted_disease", "state", "district", "village", "phone_no"
+]
+
+
+def _is_blank(value):
+    return value is None or value == "" or (isinstance(value, float) and math.isnan(value))
+
+
+def is_blank_village(village):
+    """Reports whose village is missing, non-text or whitespace-only are not aggregated."""
+    return not isinstance(village, str) or not village.strip()
+
+
+class BatchError(ValueError):
+    """Raised when the request body cannot be decoded as a batch at all."""
+
+
+def decode_batch(body, content_encoding=None):
+    """
+    Decode a (optionally gzip-compressed) batch of reports.
+    Accepts NDJSON (one report per line) or a JSON array.
+    """
+    if len(body) > MAX_PAYLOAD_BYTES:
+        raise BatchError(f"payload too large: more than {MAX_PAYLOAD_BYTES} bytes")
+    if content_encoding == "gzip" or body[:2] == b"\x1f\x8b":
+        inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            body = inflater.decompress(body, MAX_PAYLOAD_BYTES + 1)
+        except zlib.error as e:
+            raise BatchError(f"invalid gzip payload: {e}")
+        if len(body) > MAX_PAYLOAD_BYTES or inflater.unconsumed_tail:
+            raise BatchError(f"payload too large: decompresses to more than {MAX_PAYLOAD_BYTES} bytes")
+    try:
+        text = body.decode("utf-8").strip()
+    except UnicodeDecodeError:
+        raise BatchError("payload is not valid UTF-8")
+    if not text:
+        raise BatchError("empty batch")
+
+    try:
+        if text.startswith("["):
+            records = json.loads(text)
+        else:
+            records = [json.loads(line) for line in text.splitlines() if line.strip()]
+    except json.JSONDecodeError as e:
+        raise BatchError(f"invalid JSON: {e}")
+
+    if len(records) > MAX_BATCH_SIZE:
+        raise BatchError(f"batch too large: {len(records)} > {MAX_BATCH_SIZE}")
+    return records
+
+
+def validate_batch(records):
+    """
+    Validate every record in one pass over a DataFrame.
+    Returns (frame, errors) where errors maps row index -> list of messages.
+    Rows that are valid but repeat an earlier client_id in the same batch are
+    flagged with "duplicate" in the frame instead of being treated as errors.
+    """
+    df = pd.DataFrame([r if isinstance(r, dict) else {} for r in records])
+    for col in REQUIRED_FIELDS + OPTIONAL_FIELDS:
+        if col not in df.columns:
+            df[col] = None
+    df = df[REQUIRED_FIELDS + OPTIONAL_FIELDS].astype(object)
+    df = df.map(lambda v: None if _is_blank(v) else v)
+    # pandas may infer a str dtype for partly filled columns and turn None back
+    # into NaN; normalize every missing value to None explicitly.
+    df = df.astype(object).where(df.notna(), None)
+
+    problems = {}
+    not_object = pd.Series([not isinstance(r, dict) for r in records], index=df.index)
+    problems["report must be a JSON object"] = not_object
+
+    for col in REQUIRED_FIELDS:
+        problems[f"missing field: {col}"] = ~not_object & df[col].map(_is_blank)
+
+    is_list = df["symptoms"].map(lambda v: isinstance(v, list) and all(isinstance(s, str) for s in v))
+    problems["symptoms must be a list of strings"] = ~df["symptoms"].map(_is_blank) & ~is_list
+
+    problems["client_id must be a string or integer"] = df["client_id"].map(
+        lambda v: not _is_blank(v) and (isinstance(v, bool) or not isinstance(v, (str, int)))
+    )
+
+    for col in STRING_FIELDS:
+        problems[f"{col} must be a string"] = df[col].map(lambda v: not _is_blank(v) and not isinstance(v, str))
+
+    for col, limit in NUMERIC_FIELDS.items():
+        present = ~df[col].map(_is_blank)
+        # bools would otherwise pass as 0/1
+        values = pd.to_numeric(df[col].map(lambda v: None if isinstance(v, bool) else v), errors="coerce").astype("float64")
+        problems[f"{col} must be numeric"] = present & values.isna()
+        problems[f"{col} must be between -{limit} and {limit}"] = present & values.notna() & ~(values.abs() <= limit)
+        df[col] = values.astype(object).where(values.notna(), None)
+
+    mask = pd.DataFrame(problems)
+    errors = {
+        int(i): [msg for msg, bad in row.items() if bad]
+        for i, row in mask[mask.any(axis=1)].iterrows()
+    }
+
+    # Built from the raw records so integer ids are not upcast to float by pandas
+    df["client_id"] = pd.Series(
+        [None if not isinstance(r, dict) or _is_blank(r.get("client_id")) else str(r["client_id"]) for r in records],
+        index=df.index, dtype=object
+    )
+    valid = ~mask.any(axis=1)
+    df["duplicate"] = valid & df["client_id"].where(valid).duplicated(keep="first") & df["client_id"].notna()
+    return df, errors
+
+
+_idempotency_table_ready = False
+
+
+def ensure_idempotency_table(conn):
+    """Create the idempotency index on first use; later calls are a no-op."""
+    global _idempotency_table_ready
+    if _idempotency_table_ready:
+        return
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {IDEMPOTENCY_TABLE} (
+                client_id TEXT PRIMARY KEY,
+                report_id INTEGER,
+                created_at TIMESTAMP DEFAULT now()
+            );
+        """)
+    conn.commit()
+    _idempotency_table_ready = True
+
+
+def _copy_value(value):
+    """Format a value for COPY ... FROM STDIN (text format)."""
+    if value is None:
+        return "\\N"
+    if isinstance(value, list):
+        value = json.dumps(value)
+    return (str(value).replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+
+def apply_aggregate_deltas(cur, aggregate_table, disease_columns, deltas):
+    """Add per-village disease deltas to the aggregate table in two statements."""
+    columns = list(disease_columns)
+    rows = [(village, *(counts.get(col, 0) for col in columns)) for village, counts in deltas.items()]
+    assignments = ", ".join(f"{col} = p.{col} + d.{col}" for col in columns)
+    updated = execute_values(cur, f"""
+        UPDATE {aggregate_table} p SET {assignments}
+        FROM (VALUES %s) AS d (village, {", ".join(columns)})
+        WHERE p.village = d.village
+        RETURNING p.village;
+    """, rows, fetch=True)
+    seen = {r[0] for r in updated}
+    missing = [r for r in rows if r[0] not in seen]
+    if missing:
+        execute_values(cur, f"INSERT INTO {aggregate_table} (village, {', '.join(columns)}) VALUES %s;", missing)
+
+
+def ingest_batch(conn, df, errors, predict_batch, disease_column_map, aggregate_table):
+    """
+    Insert all fresh reports of a validated batch in a single transaction,
+    left open for the caller to commit.
+
+    Fresh client ids are claimed in the idempotency index first, so a retried
+    upload (or two concurrent uploads of the same batch) only inserts each
+    report once. Reports are predicted in one forward pass, written with COPY
+    and folded into the village aggregates before commit.
+
+    Returns (results, increments) where increments maps (village, column) -> count
+    for the caller to mirror into in-memory state when it commits.
+    """
+    results = [None] * len(df)
+    for i, messages in errors.items():
+        results[i] = {"index": i, "client_id": df.at[i, "client_id"], "status": "invalid", "errors": messages}
+
+    valid = df[~df.index.isin(list(errors)) & ~df["duplicate"]]
+    increments = {}
+    if valid.empty:
+        fresh = valid
+        existing = {}
+    else:
+        client_ids = valid["client_id"].tolist()
+        with conn.cursor() as cur:
+            cur.execute(
+                f"INSERT INTO {IDEMPOTENCY_TABLE} (client_id) SELECT unnest(%s::text[]) "
+                f"ON CONFLICT DO NOTHING RETURNING client_id;",
+                (client_ids,)
+            )
+            claimed = {r[0] for r in cur.fetchall()}
+            fresh = valid[valid["client_id"].isin(claimed)].copy()
+
+            existing = {}
+            if len(claimed) < len(client_ids):
+                cur.execute(
+                    f"SELECT client_id, report_id FROM {IDEMPOTENCY_TABLE} WHERE client_id = ANY(%s);",
+                    ([c for c in client_ids if c not in claimed],)
+                )
+                existing = dict(cur.fetchall())
+
+            if not fresh.empty:
+                cur.execute(
+                    "SELECT nextval(pg_get_serial_sequence(%s, 'id')) FROM generate_series(1, %s);",
+                    (REPORTS_TABLE, len(fresh))
+                )
+                fresh["id"] = [r[0] for r in cur.fetchall()]
+                fresh["predicted_disease"] = predict_batch(fresh["symptoms"].tolist())
+                fresh["description"] = fresh["description"].map(lambda v: "" if v is None else v)
+
+                buf = io.StringIO()
+                for row in fresh[COPY_COLUMNS].itertuples(index=False, name=None):
+                    buf.write("\t".join(_copy_value(v) for v in row) + "\n")
+                buf.seek(0)
+                cur.copy_expert(f"COPY {REPORTS_TABLE} ({', '.join(COPY_COLUMNS)}) FROM STDIN;", buf)
+
+                execute_values(cur, f"""
+                    UPDATE {IDEMPOTENCY_TABLE} i SET report_id = d.report_id
+                    FROM (VALUES %s) AS d (client_id, report_id)
+                    WHERE i.client_id = d.client_id;
+                """, list(zip(fresh["client_id"], fresh["id"].astype(int))))
+
+                counted = fresh[~fresh["village"].map(is_blank_village)
+                                & fresh["predicted_disease"].isin(list(disease_column_map))]
+                deltas = {}
+                for (village, disease), n in counted.groupby(["village", "predicted_disease"]).size().items():
+                    column = disease_column_map[disease]
+                    deltas.setdefault(village, {})[column] = int(n)
+                    increments[(village, column)] = int(n)
+                if deltas:
+                    apply_aggregate_deltas(cur, aggregate_table, disease_column_map.values(), deltas)
+
+    fresh_rows = {} if fresh.empty else fresh.set_index("client_id")[["id", "predicted_disease"]].to_dict("index")
+    for i in df.index:
+        if results[i] is not None:
+            continue
+        client_id = df.at[i, "client_id"]
+        if client_id in fresh_rows and not df.at[i, "duplicate"]:
+            row = fresh_rows[client_id]
+            results[i] = {"index": int(i), "client_id": client_id, "status": "created",
+                          "report_id": int(row["id"]), "predicted_disease": row["predicted_disease"]}
+        else:
+            report_id = fresh_rows[client_id]["id"] if client_id in fresh_rows else existing.get(client_id)
+            results[i] = {"index": int(i), "client_id": client_id, "status": "duplicate",
+                          "report_id": None if report_id is None else int(report_id)}
+    return results, increments
+
+
+if __name__ == "__main__":
+    # Mixed batch: optional fields present on some reports and absent on others
+    # must not make the sparse reports invalid.
+    report = {
+        "patient_name": "A", "phone_no": "1", "age_group": "adult", "symptoms": ["fever"],
+        "onset_date": "2025-01-01", "severity": "mild", "water_source": "well", "reported_by": "w1"
+    }
+    batch = [
+        {**report, "client_id": "c1", "village": "V1", "description": "d", "latitude": 26.1},
+        {**report, "client_id": "c2"},
+        {**report, "client_id": "c3", "latitude": 1000, "longitude": float("inf")},
+        {**report, "client_id": {"x": 1}, "village": {"x": 1}},
+    ]
+    frame, problems = validate_batch(batch)
+    assert sorted(problems) == [2, 3], problems
+    assert frame.at[1, "village"] is None and frame.at[1, "description"] is None
+    assert _copy_value(frame.at[1, "description"]) == "\\N"
+    print("bulk_ingest self-check passed:", problems)
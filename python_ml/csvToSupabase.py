@@ -1,14 +1,13 @@
-import pandas as pd
 import psycopg2
 from psycopg2 import sql
+from dataset_loader import load_dataset
 
 # ====== CONFIG ======
 DATABASE_URL = ""
-CSV_FILE = "data/northeast_villages_disease_data.csv"
 TABLE_NAME = "patient_diseases"
 
-# ====== Step 1: Read CSV ======
-df = pd.read_csv(CSV_FILE)
+# ====== Step 1: Read CSV (typed: category locations, uint16 counts) ======
+df = load_dataset("villages_disease")
 
 # --- Clean column names for PostgreSQL ---
 df.columns = (
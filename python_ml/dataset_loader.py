@@ -0,0 +1,177 @@
+"""
+Shared, schema-driven loading of the CSV datasets in data/.
+
+Location and level columns are read as category, 0/1 symptom flags and case
+counts as small unsigned ints and measurements as float32, instead of pandas'
+default object/int64/float64. Typed frames can be cached as Parquet next to
+the CSVs (needs pyarrow or fastparquet; skipped when neither is installed).
+
+Run `python dataset_loader.py` to print the memory and load-time comparison
+against a plain pd.read_csv for every dataset.
+"""
+import glob
+import hashlib
+import json
+import os
+import time
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+CACHE_DIR = os.path.join(DATA_DIR, ".cache")
+
+LOCATION_COLUMNS = ["State", "District", "Village"]
+DISEASE_COLUMNS = [
+    "Leptospirosis", "Norovirus", "Legionnaires_Disease", "Dysentery_Bacillary",
+    "Typhoid_Fever", "Rotavirus", "Cholera", "Giardiasis", "Dysentery_Amoebic",
+    "Hepatitis_E", "Hepatitis_A", "Schistosomiasis", "Cryptosporidiosis",
+    "Acute_Diarrhoeal_Disease", "Poliomyelitis", "E_coli_Diarrhea"
+]
+ENVIRONMENT_LEVEL_COLUMNS = [
+    "Rainfall_Level", "Humidity_Level", "Flood_Risk", "Sewage_Treatment_Quality",
+    "Land_Use_Type", "Waste_Management_Quality", "Overall_Risk_Level"
+]
+ENVIRONMENT_INT_COLUMNS = {
+    "Fecal_Coliform": "uint16",
+    "Sanitation_Coverage(%)": "uint8",
+    "Population_Density_per_km2": "uint32",
+}
+
+# dtypes: explicit per-column dtypes; default: dtype for every other column
+SCHEMAS = {
+    "villages_disease": {
+        "file": "northeast_villages_disease_data.csv",
+        "dtypes": {
+            **{col: "category" for col in LOCATION_COLUMNS},
+            "Population": "uint32",
+            "Pin_Code": "uint32",
+            **{col: "uint16" for col in DISEASE_COLUMNS},
+            "Total_Patients": "uint16",
+        },
+    },
+    "symptoms": {
+        "file": "synthetic_waterborne_disease_dataset.csv",
+        "dtypes": {"Disease": "category"},
+        "default": "uint8",
+    },
+    "environment": {
+        "file": "water_environment_dataset.csv",
+        "dtypes": {
+            **{col: "category" for col in LOCATION_COLUMNS + ENVIRONMENT_LEVEL_COLUMNS},
+            **ENVIRONMENT_INT_COLUMNS,
+        },
+        "default": "float32",
+    },
+}
+
+
+def _csv_path(name):
+    return os.path.join(DATA_DIR, SCHEMAS[name]["file"])
+
+
+def _cache_path(name):
+    """
+    Parquet cache file, keyed on the dataset's SCHEMAS entry so a schema change
+    misses the old cache (CSV header changes already bump the CSV mtime).
+    """
+    digest = hashlib.sha1(json.dumps(SCHEMAS[name], sort_keys=True).encode()).hexdigest()[:10]
+    return os.path.join(CACHE_DIR, f"{name}-{digest}.parquet")
+
+
+def schema_dtypes(name, path=None):
+    """Column -> dtype mapping for a dataset, resolved against the CSV header."""
+    schema = SCHEMAS[name]
+    header = pd.read_csv(path or _csv_path(name), nrows=0).columns
+    default = schema.get("default")
+    return {
+        col: schema["dtypes"].get(col, default)
+        for col in header
+        if col in schema["dtypes"] or default is not None
+    }
+
+
+def read_csv_compact(name, path=None):
+    """Read a dataset CSV with its explicit schema (no Parquet cache)."""
+    path = path or _csv_path(name)
+    return pd.read_csv(path, dtype=schema_dtypes(name, path))
+
+
+def load_dataset(name, path=None, cache=True):
+    """
+    Load a dataset with its compact schema.
+    With cache=True a Parquet copy is reused while it is newer than the CSV
+    and was written with the current schema.
+    """
+    path = path or _csv_path(name)
+    cache_file = _cache_path(name) if path == _csv_path(name) else None
+
+    if cache and cache_file and os.path.exists(cache_file) \
+            and os.path.getmtime(cache_file) >= os.path.getmtime(path):
+        try:
+            return pd.read_parquet(cache_file)
+        except ImportError:
+            pass
+
+    df = read_csv_compact(name, path)
+    if cache and cache_file:
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            for stale in glob.glob(os.path.join(CACHE_DIR, f"{name}-*.parquet")):
+                os.remove(stale)
+            df.to_parquet(cache_file, index=False)
+        except (ImportError, OSError) as e:
+            print(f"[dataset_loader] Parquet cache disabled: {e}")
+    return df
+
+
+def _median_seconds(load, repeats=5):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        load()
+        timings.append(time.perf_counter() - start)
+    return sorted(timings)[len(timings) // 2]
+
+
+def memory_report(name, repeats=5):
+    """
+    Compare memory and load time of the compact loader against plain pd.read_csv.
+    Times are medians over `repeats` loads; the Parquet cache is written before
+    it is timed. Parsing the CSV with the typed schema is itself slower than a
+    plain read_csv, so any load-time gain comes from the cache.
+    """
+    path = _csv_path(name)
+    raw = pd.read_csv(path)
+    compact = read_csv_compact(name, path)
+    raw_bytes = int(raw.memory_usage(deep=True).sum())
+    compact_bytes = int(compact.memory_usage(deep=True).sum())
+
+    raw_seconds = _median_seconds(lambda: pd.read_csv(path), repeats)
+    report = {
+        "dataset": name,
+        "rows": len(compact),
+        "raw_bytes": raw_bytes,
+        "compact_bytes": compact_bytes,
+        "memory_reduction": round(raw_bytes / compact_bytes, 2),
+        "raw_csv_seconds": round(raw_seconds, 4),
+        "compact_csv_seconds": round(_median_seconds(lambda: read_csv_compact(name, path), repeats), 4),
+    }
+
+    load_dataset(name)  # make sure the cache exists before timing it
+    if os.path.exists(_cache_path(name)):
+        cached_seconds = _median_seconds(lambda: load_dataset(name), repeats)
+        report["parquet_seconds"] = round(cached_seconds, 4)
+        report["load_speedup"] = round(raw_seconds / cached_seconds, 2)
+    return report
+
+
+if __name__ == "__main__":
+    for dataset in SCHEMAS:
+        r = memory_report(dataset)
+        line = (f"{r['dataset']}: {r['rows']} rows, "
+                f"{r['raw_bytes'] / 1024:.0f} KiB -> {r['compact_bytes'] / 1024:.0f} KiB "
+                f"({r['memory_reduction']}x smaller), "
+                f"read_csv {r['raw_csv_seconds']}s, typed read_csv {r['compact_csv_seconds']}s")
+        if "parquet_seconds" in r:
+            line += f", Parquet cache {r['parquet_seconds']}s ({r['load_speedup']}x vs read_csv)"
+        print(line)
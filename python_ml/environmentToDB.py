@@ -1,5 +1,6 @@
 import pandas as pd
 from sqlalchemy import create_engine
+from dataset_loader import load_dataset
 
 # --- 1. Supabase Connection Details (with SSL + encoded password) ---
 SUPABASE_CONNECTION_URL = (
@@ -28,8 +29,8 @@ def clean_column_names(df):
 def upload_to_supabase():
     """Reads CSV, cleans data, and uploads it to the specified Supabase table."""
     try:
-        # Load and clean the CSV
-        df = pd.read_csv(CSV_FILE_NAME)
+        # Load the CSV with its typed schema (categories, small ints, float32)
+        df = load_dataset("environment")
         print(f"✅ Successfully loaded {CSV_FILE_NAME} with {len(df)} records.")
         df = clean_column_names(df)
         print("✅ Column names cleaned for PostgreSQL compatibility.")
@@ -39,17 +40,10 @@ def upload_to_supabase():
         print("✅ SQLAlchemy Engine created.")
 
         # --- Data Cleaning ---
-        for col in df.columns:
-            if df[col].dtype == object and col not in [
-                "overall_risk_level",
-                "land_use_type",
-                "rainfall_level",
-                "humidity_level",
-                "flood_risk",
-                "sewage_treatment_quality",
-                "waste_management_quality",
-            ]:
-                df[col] = pd.to_numeric(df[col], errors="ignore")
+        # Numeric columns are already typed by the loader. Widen float32 via
+        # its shortest repr so 7.38 is stored as 7.38, not 7.380000114.
+        float_cols = df.select_dtypes("float32").columns
+        df[float_cols] = df[float_cols].astype(str).astype("float64")
 
         # Drop only fully empty rows
         df = df.dropna(how="all")
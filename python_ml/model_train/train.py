@@ -4,22 +4,25 @@ import torch.nn as nn
 import torch.optim as optim
 import pickle
 import os
+import sys
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dataset_loader import load_dataset
+
 # Paths
-DATA_PATH = r"E:\SIH Machine Learning\SIH_ML\data\synthetic_waterborne_disease_dataset.csv"
 MODEL_DIR = r"E:\SIH Machine Learning\SIH_ML\trained_model"
 
 # Ensure trained_model folder exists
 os.makedirs(MODEL_DIR, exist_ok=True)
 
-# Load dataset
-df = pd.read_csv(DATA_PATH)
+# Load dataset (uint8 symptom flags, categorical Disease)
+df = load_dataset("symptoms")
 
 # Features = all symptom columns (everything except Disease)
 X = df.drop("Disease", axis=1).values
-y = df["Disease"].values
+y = df["Disease"].astype(str).values
 
 # Save symptom column order for inference
 symptom_columns = df.drop("Disease", axis=1).columns.tolist()
@@ -1,3 +1,5 @@
+import os
+import sys
 import pandas as pd
 import joblib
 from sklearn.model_selection import train_test_split
@@ -5,10 +7,13 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import LabelEncoder
 from sklearn.metrics import accuracy_score
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dataset_loader import load_dataset
+
 # ===============================
 # 1. Load & Clean Dataset
 # ===============================
-df = pd.read_csv("data/water_environment_dataset.csv")
+df = load_dataset("environment")
 
 # Standardize and clean column names
 df.columns = df.columns.str.strip().str.replace(" ", "_").str.replace("(", "").str.replace(")", "").str.replace("%", "percent").str.replace("/", "")
@@ -42,11 +47,12 @@ df = df.dropna(subset=required_cols + [target_col]).reset_index(drop=True)
 level_mapping = {'Very Low': 0, 'Low': 1, 'Moderate': 2, 'High': 3, 'High Risk': 4}
 quality_mapping = {'Poor': 0, 'Moderate': 1, 'Good': 2}
 
+# Levels are loaded as category; map back to plain numeric codes for the model
 for col in ['Rainfall_Level', 'Humidity_Level', 'Flood_Risk']:
-    df[col] = df[col].map(level_mapping)
+    df[col] = df[col].astype(str).map(level_mapping).astype("float32")
 
 for col in ['Sewage_Treatment_Quality', 'Waste_Management_Quality']:
-    df[col] = df[col].map(quality_mapping)
+    df[col] = df[col].astype(str).map(quality_mapping).astype("float32")
 
 # One-Hot Encode 'Land_Use_Type'
 df = pd.get_dummies(df, columns=['Land_Use_Type'], drop_first=True)
@@ -59,7 +65,7 @@ feature_cols.extend(ohe_cols)
 
 # Encode target variable
 le = LabelEncoder()
-df[target_col] = le.fit_transform(df[target_col])
+df[target_col] = le.fit_transform(df[target_col].astype(str))
 
 
 # ===============================
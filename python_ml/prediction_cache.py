@@ -0,0 +1,62 @@
+import threading
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache for disease predictions.
+
+    Keys are symptom bitsets (bit i set <=> symptom_columns[i] present), values
+    are whatever the predictor returns for that combination. Entries are tied
+    to a model version: set_version() with a different version drops them all.
+    """
+
+    def __init__(self, maxsize=4096, version=None):
+        self.maxsize = maxsize
+        self.version = version
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, version=None):
+        """
+        Store a prediction computed with model `version` (read before running
+        the model). It is dropped if the version has changed in the meantime.
+        """
+        with self._lock:
+            if version is not None and version != self.version:
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def set_version(self, version):
+        """Switch to a new model version, invalidating every cached prediction."""
+        with self._lock:
+            if version != self.version:
+                self._entries.clear()
+                self.version = version
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "version": self.version,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,237 @@
+import threading
+import numpy as np
+
+
+class VillageAnalytics:
+    """
+    In-memory columnar snapshot of the patient_diseases aggregate table.
+
+    Locations are dictionary-encoded (state / district / village -> int code)
+    and the per-disease counts live in a single (villages x diseases) int32
+    matrix, so ranking queries are a column sum plus an argpartition instead
+    of a round trip to Postgres. The snapshot is loaded lazily from the
+    database, kept in sync through increment() and can be rebuilt with
+    refresh().
+    """
+
+    def __init__(self, connection_factory, table_name, disease_columns):
+        self._connect = connection_factory
+        self._table = table_name
+        self.disease_columns = list(disease_columns)
+        self._disease_index = {col: i for i, col in enumerate(self.disease_columns)}
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._reset()
+
+    def _reset(self, capacity=0):
+        self._states, self._state_codes = [], {}
+        self._districts, self._district_codes = [], {}
+        self._villages, self._village_rows = [], {}
+        self._size = 0
+        self._state = np.zeros(capacity, dtype=np.int32)
+        self._district = np.zeros(capacity, dtype=np.int32)
+        self._population = np.zeros(capacity, dtype=np.int64)
+        self._counts = np.zeros((capacity, len(self.disease_columns)), dtype=np.int32)
+
+    # ---------------- encoding helpers ----------------
+    @staticmethod
+    def _encode(value, values, codes):
+        code = codes.get(value)
+        if code is None:
+            code = len(values)
+            codes[value] = code
+            values.append(value)
+        return code
+
+    def _grow(self):
+        capacity = max(16, 2 * len(self._population))
+        extra = capacity - len(self._population)
+        self._state = np.concatenate([self._state, np.zeros(extra, dtype=np.int32)])
+        self._district = np.concatenate([self._district, np.zeros(extra, dtype=np.int32)])
+        self._population = np.concatenate([self._population, np.zeros(extra, dtype=np.int64)])
+        self._counts = np.vstack([self._counts, np.zeros((extra, self._counts.shape[1]), dtype=np.int32)])
+
+    def _append_row(self, state, district, village, population, counts):
+        if self._size == len(self._population):
+            self._grow()
+        row = self._size
+        self._state[row] = self._encode(state, self._states, self._state_codes)
+        self._district[row] = self._encode(district, self._districts, self._district_codes)
+        self._population[row] = population or 0
+        self._counts[row] = counts
+        self._village_rows[village] = row
+        self._villages.append(village)
+        self._size += 1
+        return row
+
+    # ---------------- loading & sync ----------------
+    def refresh(self):
+        """
+        Rebuild the snapshot from the aggregate table.
+
+        The SELECT and the swap run under the same lock that commit_and_mirror()
+        holds, so every write is either in the SELECT result or applied to the
+        new snapshot afterwards, never both or neither.
+        """
+        columns = ", ".join(f"COALESCE({col}, 0)" for col in self.disease_columns)
+        with self._lock:
+            conn = self._connect()
+            try:
+                cur = conn.cursor()
+                cur.execute(f"SELECT state, district, village, COALESCE(population, 0), {columns} FROM {self._table};")
+                rows = cur.fetchall()
+                cur.close()
+            finally:
+                conn.close()
+
+            self._reset(capacity=len(rows))
+            for row in rows:
+                state, district, village, population = row[:4]
+                if village in self._village_rows:
+                    # Duplicate village rows are summed, matching SUM() over the table.
+                    self._counts[self._village_rows[village]] += np.asarray(row[4:], dtype=np.int32)
+                    continue
+                self._append_row(state, district, village, population, row[4:])
+            self._loaded = True
+
+    def ensure_loaded(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self.refresh()
+
+    def increment(self, village, column, amount=1):
+        """Mirror an increment of the aggregate table that has already been committed."""
+        if column not in self._disease_index:
+            return
+        with self._lock:
+            if not self._loaded:
+                return
+            row = self._village_rows.get(village)
+            if row is None:
+                row = self._append_row(None, None, village, 0, 0)
+            self._counts[row, self._disease_index[column]] += amount
+
+    def commit_and_mirror(self, conn, increments):
+        """
+        Commit `conn` and mirror `increments` ((village, column) -> count) while
+        holding the snapshot lock, so a concurrent refresh() cannot drop or
+        double count them.
+        """
+        with self._lock:
+            conn.commit()
+            for (village, column), amount in increments.items():
+                self.increment(village, column, amount)
+
+    # ---------------- queries ----------------
+    def _mask(self, state=None, district=None):
+        mask = np.ones(self._size, dtype=bool)
+        if state is not None:
+            code = self._state_codes.get(state)
+            if code is None:
+                return np.zeros(self._size, dtype=bool)
+            mask &= self._state[:self._size] == code
+        if district is not None:
+            code = self._district_codes.get(district)
+            if code is None:
+                return np.zeros(self._size, dtype=bool)
+            mask &= self._district[:self._size] == code
+        return mask
+
+    @staticmethod
+    def _top_k(rows, scores, limit):
+        """Indices into rows of the `limit` highest scores, best first."""
+        if limit <= 0 or len(rows) == 0:
+            return rows[:0]
+        if limit < len(rows):
+            part = np.argpartition(-scores, limit - 1)[:limit]
+        else:
+            part = np.arange(len(rows))
+        order = part[np.argsort(-scores[part], kind="stable")]
+        return rows[order]
+
+    def top_by_total(self, state=None, district=None, limit=20):
+        self.ensure_loaded()
+        with self._lock:
+            rows = np.flatnonzero(self._mask(state, district))
+            totals = self._counts[rows].sum(axis=1, dtype=np.int64)
+            top = self._top_k(np.arange(len(rows)), totals, limit)
+            return [
+                {"village": self._villages[rows[i]], "total_cases": int(totals[i])}
+                for i in top
+            ]
+
+    def top_by_percentage(self, state=None, district=None, limit=20):
+        self.ensure_loaded()
+        with self._lock:
+            rows = np.flatnonzero(self._mask(state, district))
+            totals = self._counts[rows].sum(axis=1, dtype=np.int64)
+            population = self._population[rows]
+            percentage = np.zeros(len(rows), dtype=np.float64)
+            has_pop = population > 0
+            percentage[has_pop] = np.round(totals[has_pop] / population[has_pop] * 100, 2)
+            top = self._top_k(np.arange(len(rows)), percentage, limit)
+            return [
+                {
+                    "village": self._villages[rows[i]],
+                    "total_cases": int(totals[i]),
+                    "population": int(population[i]),
+                    "percentage_affected": float(percentage[i])
+                }
+                for i in top
+            ]
+
+    def top_by_disease(self, column, state=None, district=None, limit=20):
+        if column not in self._disease_index:
+            raise KeyError(column)
+        self.ensure_loaded()
+        with self._lock:
+            rows = np.flatnonzero(self._mask(state, district))
+            cases = self._counts[rows, self._disease_index[column]].astype(np.int64)
+            top = self._top_k(np.arange(len(rows)), cases, limit)
+            return [
+                {"village": self._villages[rows[i]], "cases": int(cases[i])}
+                for i in top
+            ]
+
+    def district_rollup(self, state=None):
+        """
+        Per-district totals (overall and per disease), highest total first.
+        Villages without a known district (first seen through increment()) are left out.
+        """
+        self.ensure_loaded()
+        with self._lock:
+            mask = self._mask(state)
+            unknown = self._district_codes.get(None)
+            if unknown is not None:
+                mask &= self._district[:self._size] != unknown
+            rows = np.flatnonzero(mask)
+            district_codes = self._district[rows]
+            sums = np.zeros((len(self._districts), len(self.disease_columns)), dtype=np.int64)
+            np.add.at(sums, district_codes, self._counts[rows])
+            population = np.bincount(district_codes, weights=self._population[rows],
+                                     minlength=len(self._districts)).astype(np.int64)
+            villages = np.bincount(district_codes, minlength=len(self._districts))
+            present = np.flatnonzero(villages)
+            totals = sums.sum(axis=1)
+            top = self._top_k(present, totals[present], len(present))
+            return [
+                {
+                    "district": self._districts[d],
+                    "villages": int(villages[d]),
+                    "population": int(population[d]),
+                    "total_cases": int(totals[d]),
+                    "diseases": {col: int(sums[d, j]) for j, col in enumerate(self.disease_columns)}
+                }
+                for d in top
+            ]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "loaded": self._loaded,
+                "villages": self._size,
+                "districts": len(self._districts),
+                "bytes": int(self._counts.nbytes + self._population.nbytes
+                             + self._state.nbytes + self._district.nbytes)
+            }
@@ -0,0 +1,178 @@
+import sqlite3
+import threading
+import time
+import uuid
+from bulk_ingest import apply_aggregate_deltas
+
+
+class IncrementQueue:
+    """
+    Durable write-behind queue for patient_diseases increments.
+
+    enqueue() appends to a local SQLite file (WAL, synchronous=FULL) and
+    returns at once. flush() coalesces pending rows per (village, disease
+    column) and applies them to Postgres in one batched transaction, which
+    also advances a per-queue watermark (highest applied queue id). Local rows
+    are deleted afterwards; if the process dies in between, the next flush
+    skips rows at or below the watermark, so every increment is applied
+    exactly once. Failed flushes are retried with exponential backoff.
+    """
+
+    WATERMARK_TABLE = "increment_queue_watermark"
+
+    def __init__(self, path, connection_factory, aggregate_table, disease_columns,
+                 batch_size=5000, base_backoff=2.0, max_backoff=300.0, commit=None):
+        self.path = path
+        self._connect = connection_factory
+        self._table = aggregate_table
+        self.disease_columns = list(disease_columns)
+        self.batch_size = batch_size
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        # commit(conn, increments) commits the flush transaction; lets the caller
+        # mirror the (village, column) -> count increments atomically with it.
+        self.commit = commit or (lambda conn, increments: conn.commit())
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL;")
+        self._db.execute("PRAGMA synchronous=FULL;")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS pending_increments (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                village TEXT NOT NULL,
+                disease_column TEXT NOT NULL,
+                amount INTEGER NOT NULL DEFAULT 1,
+                enqueued_at REAL NOT NULL
+            );
+        """)
+        self._db.execute("CREATE TABLE IF NOT EXISTS queue_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);")
+        # The watermark is keyed by an id stored in the queue file itself, so a
+        # recreated file (whose row ids restart at 1) gets a fresh watermark.
+        self._db.execute("INSERT OR IGNORE INTO queue_meta (key, value) VALUES ('queue_id', ?);", (uuid.uuid4().hex,))
+        self._db.commit()
+        self.queue_id = self._db.execute("SELECT value FROM queue_meta WHERE key = 'queue_id';").fetchone()[0]
+        self._watermark_table_ready = False
+
+        self.failures = 0
+        self.retry_at = 0.0
+        self.last_error = None
+        self.last_flush_at = None
+        self.flushed_total = 0
+
+    def _lock_watermark(self, cur):
+        """Return the highest queue id already applied to Postgres, row-locked for this transaction."""
+        if not self._watermark_table_ready:
+            cur.execute(f"""
+                CREATE TABLE IF NOT EXISTS {self.WATERMARK_TABLE} (
+                    queue_id TEXT PRIMARY KEY,
+                    applied_id BIGINT NOT NULL DEFAULT 0
+                );
+            """)
+        cur.execute(
+            f"INSERT INTO {self.WATERMARK_TABLE} (queue_id) VALUES (%s) ON CONFLICT DO NOTHING;",
+            (self.queue_id,)
+        )
+        cur.execute(
+            f"SELECT applied_id FROM {self.WATERMARK_TABLE} WHERE queue_id = %s FOR UPDATE;",
+            (self.queue_id,)
+        )
+        return cur.fetchone()[0]
+
+    def enqueue(self, village, column, amount=1):
+        if not village:
+            raise ValueError("village is required")
+        if column not in self.disease_columns:
+            raise ValueError(f"unknown disease column: {column}")
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO pending_increments (village, disease_column, amount, enqueued_at) VALUES (?, ?, ?, ?);",
+                (village, column, amount, time.time())
+            )
+            self._db.commit()
+
+    def flush(self, force=False):
+        """
+        Apply up to batch_size queued increments. Returns the number of queue
+        rows flushed; 0 when empty, still backing off, or the write failed.
+        """
+        if not force and time.time() < self.retry_at:
+            return 0
+        if not self._flush_lock.acquire(blocking=False):
+            return 0
+        try:
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT id, village, disease_column, amount FROM pending_increments ORDER BY id LIMIT ?;",
+                    (self.batch_size,)
+                ).fetchall()
+            if not rows:
+                return 0
+
+            try:
+                conn = self._connect()
+                try:
+                    with conn.cursor() as cur:
+                        applied_id = self._lock_watermark(cur)
+                        deltas = {}
+                        for row_id, village, column, amount in rows:
+                            if row_id <= applied_id:
+                                continue  # applied before a crash, not yet deleted locally
+                            counts = deltas.setdefault(village, {})
+                            counts[column] = counts.get(column, 0) + amount
+                        if deltas:
+                            apply_aggregate_deltas(cur, self._table, self.disease_columns, deltas)
+                        cur.execute(
+                            f"UPDATE {self.WATERMARK_TABLE} SET applied_id = %s WHERE queue_id = %s;",
+                            (max(applied_id, rows[-1][0]), self.queue_id)
+                        )
+                    self.commit(conn, {
+                        (village, column): amount
+                        for village, counts in deltas.items()
+                        for column, amount in counts.items()
+                    })
+                    self._watermark_table_ready = True
+                finally:
+                    conn.close()
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                delay = min(self.base_backoff * 2 ** (self.failures - 1), self.max_backoff)
+                self.retry_at = time.time() + delay
+                print(f"[WriteQueue] Flush of {len(rows)} increments failed, retrying in {delay:.0f}s: {e}")
+                return 0
+
+            with self._lock:
+                self._db.execute("DELETE FROM pending_increments WHERE id <= ?;", (rows[-1][0],))
+                self._db.commit()
+            self.failures = 0
+            self.retry_at = 0.0
+            self.last_error = None
+            self.last_flush_at = time.time()
+            self.flushed_total += len(rows)
+            return len(rows)
+        finally:
+            self._flush_lock.release()
+
+    def drain(self):
+        """Flush until the queue is empty or a flush fails (used at shutdown)."""
+        while self.flush(force=True):
+            pass
+
+    def stats(self):
+        with self._lock:
+            depth, increments, oldest = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(amount), 0), MIN(enqueued_at) FROM pending_increments;"
+            ).fetchone()
+        now = time.time()
+        return {
+            "depth": depth,
+            "pending_increments": increments,
+            "flush_lag_seconds": round(now - oldest, 3) if oldest else 0.0,
+            "last_flush_at": self.last_flush_at,
+            "flushed_total": self.flushed_total,
+            "consecutive_failures": self.failures,
+            "retry_in_seconds": round(max(self.retry_at - now, 0.0), 3),
+            "last_error": self.last_error
+        }